@@ -1,13 +1,19 @@
 import streamlit as st
-import pandas as pd
 import time
 import os
 import shutil
 from datetime import datetime
 from sqlalchemy.exc import OperationalError
 from auth import verificar_login, logout
-from database import get_connection, get_session
-from models import Base, Setor, Modalidade, FaseTemplate, Processo, Usuario
+from database import get_connection, get_session, sincronizar_schema
+from consultas import listar_modalidades_com_fases
+from models import Base, Setor, Modalidade, FaseTemplate, Processo, Usuario, FASE_FINAL
+from regras_processos import arquivar_finalizados
+
+# Dias que um processo fica em "Finalizado" antes de ir para o arquivo
+ARQUIVAR_APOS_DIAS = int(os.getenv("ARQUIVAR_APOS_DIAS", "30"))
+# Intervalo mínimo entre duas execuções do arquivamento no mesmo processo do Streamlit
+ARQUIVAR_INTERVALO_HORAS = float(os.getenv("ARQUIVAR_INTERVALO_HORAS", "24"))
 
 # 1. Configuração da Página
 st.set_page_config(
@@ -17,6 +23,8 @@ st.set_page_config(
 )
 
 # 2. Funções Utilitárias (Backup)
+# Cache por hora: a verificação não se repete a cada rerun da tela de login
+@st.cache_resource(ttl=3600, show_spinner=False)
 def realizar_backup_automatico():
     """Cria uma cópia diária do banco se ela ainda não existir."""
     pasta_backup = "backups"
@@ -41,19 +49,43 @@ realizar_backup_automatico()
 conn = get_connection()
 session = get_session()
 
-# Verificação de integridade do banco (Schema Mismatch)
-try:
-    session.query(Usuario).first()
-except OperationalError:
-    # Se houver erro de coluna faltando (mudança de estrutura), reseta
-    Base.metadata.drop_all(conn.engine)
+# Verificação de schema: uma vez por processo do Streamlit, não a cada rerun
+@st.cache_resource(show_spinner=False)
+def preparar_banco():
+    """Garante as tabelas (e colunas novas em tabelas antigas). Retorna True se o banco foi recriado."""
+    recriado = False
+    # Verificação de integridade do banco (Schema Mismatch)
+    try:
+        session.query(Usuario).first()
+    except OperationalError:
+        # Se houver erro de coluna faltando (mudança de estrutura), reseta
+        session.rollback()
+        Base.metadata.drop_all(conn.engine)
+        recriado = True
+    except Exception:
+        session.rollback()
+
+    # Garante que as tabelas existem (e as colunas novas em tabelas antigas)
     Base.metadata.create_all(conn.engine)
+    with conn.engine.begin() as c:
+        sincronizar_schema(c, Base.metadata)
+    return recriado
+
+if preparar_banco() and not st.session_state.get("aviso_banco_recriado"):
+    st.session_state.aviso_banco_recriado = True
     st.toast("Banco de dados atualizado para nova versão!", icon="🔄")
-except Exception:
-    Base.metadata.create_all(conn.engine)
 
-# Garante que as tabelas existem
-Base.metadata.create_all(conn.engine)
+# Arquivamento agendado: roda no máximo uma vez por intervalo, não a cada rerun
+@st.cache_resource(ttl=ARQUIVAR_INTERVALO_HORAS * 3600, show_spinner=False)
+def arquivar_processos_finalizados():
+    """Marca como arquivados os processos finalizados há mais de ARQUIVAR_APOS_DIAS."""
+    with conn.engine.begin() as c:
+        return arquivar_finalizados(c, Processo.__table__, ARQUIVAR_APOS_DIAS)
+
+try:
+    arquivar_processos_finalizados()
+except Exception as e:
+    print(f"Falha no arquivamento: {e}")
 
 # 4. Verificação de Login
 # Se não estiver logado, para a execução aqui.
@@ -66,7 +98,8 @@ if not verificar_login():
 def modal_novo_processo():
     """Formulário de cadastro vinculado ao Núcleo do usuário."""
     session = get_session()
-    mods = session.query(Modalidade).all()
+    # Fases carregadas junto (uma consulta), para não buscar a fase inicial a cada cadastro
+    mods = listar_modalidades_com_fases(session)
     
     if not mods:
         st.warning("⚠️ Nenhuma modalidade cadastrada. Contate o Admin.")
@@ -95,10 +128,8 @@ def modal_novo_processo():
                 st.error("Erro: SEI já cadastrado.")
             else:
                 try:
-                    # Busca fase inicial automaticamente
-                    fase_ini = session.query(FaseTemplate)\
-                        .filter_by(modalidade_id=mod_sel.id)\
-                        .order_by(FaseTemplate.ordem).first()
+                    # Fase inicial = primeira do fluxo (já carregado e ordenado)
+                    fase_ini = mod_sel.fases[0] if mod_sel.fases else None
                     
                     novo = Processo(
                         numero_sei=sei,
@@ -148,6 +179,10 @@ def modal_movimentar_processo(processo_id):
         
         if st.form_submit_button("Salvar Alterações"):
             try:
+                if nova_fase != proc.fase_atual:
+                    # Marca o início do prazo de arquivamento (ou desarquiva se reaberto)
+                    proc.data_finalizacao = datetime.now() if nova_fase == FASE_FINAL else None
+                    proc.arquivado = False
                 proc.fase_atual = nova_fase
                 proc.valor_previsto = novo_valor
                 session.commit()
@@ -185,7 +220,7 @@ if menu == "Gestão de Processos":
     st.title("🗂️ Gestão de Processos")
     
     # Botão Novo e Filtros
-    col_btn, col_busca, col_filtro = st.columns([0.2, 0.4, 0.4])
+    col_btn, col_busca, col_filtro, col_arq = st.columns([0.2, 0.35, 0.3, 0.15])
     
     with col_btn:
         st.write("") 
@@ -202,18 +237,18 @@ if menu == "Gestão de Processos":
         opcoes_setores = [s.nome for s in all_setores]
         filtro_setor = st.multiselect("Filtrar por Núcleo:", opcoes_setores)
 
+    with col_arq:
+        st.write("")
+        st.write("")
+        incluir_arquivados = st.toggle("Incluir arquivados")
+
     st.divider()
 
-    # Query Principal (Join com Setor e Modalidade)
-    query = session.query(
-        Processo.id, Processo.numero_sei, Processo.objeto, 
-        Processo.valor_previsto, Processo.fase_atual, Processo.data_autorizacao,
-        Setor.nome.label("setor"), Modalidade.nome.label("modalidade")
-    ).outerjoin(Setor, Processo.setor_origem_id == Setor.id)\
-     .outerjoin(Modalidade, Processo.modalidade_id == Modalidade.id)
-    
-    # Carrega DataFrame
-    df = pd.read_sql(query.statement, session.bind)
+    # Importação tardia: pandas (via snapshot) só é carregado nesta tela, não no login
+    from snapshot_processos import obter_snapshot_processos
+
+    # Lista de processos: snapshot compartilhado entre as sessões, remontado só quando os dados mudam
+    df = obter_snapshot_processos().obter(session, incluir_arquivados)
     
     if not df.empty:
         # Filtros Python (Pandas)
@@ -255,6 +290,8 @@ if menu == "Gestão de Processos":
                 "setor": "Núcleo",
                 "modalidade": "Modalidade",
                 "fase_atual": "Fase Atual",
+                "arquivado": st.column_config.CheckboxColumn("Arquivado"),
+                "seq_alteracao": None,
                 "valor_previsto": st.column_config.NumberColumn("Valor", format="R$ %.2f"),
                 "data_autorizacao": st.column_config.DatetimeColumn("Data", format="DD/MM/YYYY"),
             },
@@ -313,10 +350,10 @@ elif menu == "Configurar Modalidades (Admin)":
 
         st.divider()
         st.subheader("Modalidades Ativas")
-        for m in session.query(Modalidade).all():
+        # Carga única (selectinload) em vez de uma consulta de fases por modalidade
+        for m in listar_modalidades_com_fases(session):
             with st.expander(f"📂 {m.nome}"):
-                fs = session.query(FaseTemplate).filter_by(modalidade_id=m.id).order_by(FaseTemplate.ordem).all()
-                for f in fs:
+                for f in m.fases:
                     st.text(f"{f.ordem}. {f.nome}")
 
     # ABA 2: BACKUPS
@@ -341,6 +378,7 @@ elif menu == "Configurar Modalidades (Admin)":
             arquivos = [f for f in os.listdir(pasta) if f.endswith(".db")]
             arquivos.sort(reverse=True)
             if arquivos:
+                import pandas as pd  # Importação tardia (só nesta aba)
                 st.dataframe(pd.DataFrame(arquivos, columns=["Arquivo"]), use_container_width=True)
             else:
                 st.caption("Nenhum backup automático ainda.")
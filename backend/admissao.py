@@ -0,0 +1,102 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+
+from backend.database import CONEXOES_POOL
+
+# Controle de admissão: cada grupo de rotas tem sua cota de conexões do pool. Acima da cota
+# a requisição espera numa fila curta; com a fila cheia (ou espera esgotada) recebe 503 na
+# hora, em vez de ficar presa no pool do SQLAlchemy até estourar o timeout.
+# As cotas saem do pool que o engine realmente criou (pool_size + max_overflow), não de
+# DB_MAX_CONEXOES: sem ele o SQLAlchemy usa 5 + 10 e é isso que existe para dividir.
+CONEXOES_POR_WORKER = CONEXOES_POOL
+ESPERA_MAXIMA_S = float(os.getenv("ADMISSAO_ESPERA_MAXIMA_S", "2"))
+RETRY_AFTER_S = int(os.getenv("ADMISSAO_RETRY_AFTER_S", "2"))
+
+class LimiteConcorrencia:
+    """Semáforo com fila limitada e contadores para monitoramento."""
+
+    def __init__(self, nome: str, limite: int, fila_maxima: int):
+        self.nome = nome
+        self.limite = limite
+        self.fila_maxima = fila_maxima
+        self._semaforo = asyncio.Semaphore(limite)
+        self.em_uso = 0
+        self.na_fila = 0
+        self.atendidas = 0
+        self.rejeitadas = 0
+
+    def _rejeitar(self, motivo: str):
+        self.rejeitadas += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Servidor ocupado ({self.nome}: {motivo}). Tente novamente em instantes.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+
+    async def __call__(self):
+        """Dependência FastAPI: ocupa uma vaga durante toda a requisição."""
+        async with self.ocupar():
+            yield
+
+    @asynccontextmanager
+    async def ocupar(self):
+        """Ocupa uma vaga só durante o bloco (ex.: cada consulta de um long-poll)."""
+        if self._semaforo.locked():
+            if self.na_fila >= self.fila_maxima:
+                self._rejeitar("fila cheia")
+            self.na_fila += 1
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), ESPERA_MAXIMA_S)
+            except asyncio.TimeoutError:
+                self._rejeitar("espera esgotada")
+            finally:
+                self.na_fila -= 1
+        else:
+            await self._semaforo.acquire()
+
+        self.em_uso += 1
+        try:
+            yield
+        finally:
+            self.em_uso -= 1
+            self.atendidas += 1
+            self._semaforo.release()
+
+    def metricas(self) -> dict:
+        return {
+            "limite": self.limite,
+            "fila_maxima": self.fila_maxima,
+            "em_uso": self.em_uso,
+            "na_fila": self.na_fila,
+            "atendidas": self.atendidas,
+            "rejeitadas": self.rejeitadas,
+        }
+
+def criar_limite(nome: str, fracao_pool: float, fila_padrao: int = None) -> LimiteConcorrencia:
+    """
+    Cota padrão = fração das conexões do worker; ajustável por ADMISSAO_LIMITE_<NOME>,
+    mas nunca acima do pool (o excedente só trocaria o 503 rápido pela espera no pool).
+    """
+    limite = int(os.getenv(f"ADMISSAO_LIMITE_{nome.upper()}", int(CONEXOES_POR_WORKER * fracao_pool)))
+    limite = min(max(limite, 1), CONEXOES_POR_WORKER)
+    fila = int(os.getenv(f"ADMISSAO_FILA_{nome.upper()}", limite if fila_padrao is None else fila_padrao))
+    return LimiteConcorrencia(nome, limite, fila)
+
+# Cotas separadas: listagens em massa e o long-poll do feed não tiram vagas do cadastro.
+# No feed a cota de conexões é ocupada só em cada consulta (o long-poll devolve a conexão
+# entre as consultas); quem limita os clientes parados esperando é "long_poll", que não
+# depende do pool: é uma conexão HTTP ociosa, não uma conexão com o banco.
+# Na fila do feed cabem todos os clientes de long-poll: quem espera ali não segura conexão.
+LIMITE_LONG_POLL = int(os.getenv("ADMISSAO_LIMITE_LONG_POLL", "200"))
+LIMITES = {
+    "escrita": criar_limite("escrita", 0.25),
+    "leitura": criar_limite("leitura", 0.5),
+    "feed": criar_limite("feed", 0.25, fila_padrao=LIMITE_LONG_POLL),
+    "long_poll": LimiteConcorrencia("long_poll", LIMITE_LONG_POLL, 0),
+}
+limite_escrita = LIMITES["escrita"]
+limite_leitura = LIMITES["leitura"]
+limite_feed = LIMITES["feed"]
+limite_long_poll = LIMITES["long_poll"]
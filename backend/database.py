@@ -1,7 +1,11 @@
+import asyncio
 import os
+import tempfile
 import tomllib  # Para Python 3.11+ (Se der erro, use 'import toml' e instale pip install toml)
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from migracoes import sincronizar_schema  # Reexportado para o backend.main
 
 # 1. Função para ler o secrets.toml manualmente (já que o FastAPI não é o Streamlit)
 def get_database_url():
@@ -15,10 +19,38 @@ def get_database_url():
 
 DATABASE_URL = get_database_url()
 
-# 2. Criação do Motor Assíncrono
-engine = create_async_engine(DATABASE_URL, echo=True)
+# 2. Dimensionamento do pool por worker
+# Só quando DB_MAX_CONEXOES é informado: o total do servidor (menos as reservadas) é dividido
+# entre os workers. WEB_CONCURRENCY é lido tanto pelo uvicorn (--workers) quanto pelo gunicorn,
+# então um único valor define quantos workers sobem e quantas conexões cada um pode abrir.
+# Sem DB_MAX_CONEXOES vale o padrão do SQLAlchemy (5 + 10 por worker).
+WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+DB_MAX_CONEXOES = os.getenv("DB_MAX_CONEXOES")  # max_connections do servidor
+DB_CONEXOES_RESERVADAS = int(os.getenv("DB_CONEXOES_RESERVADAS", "10"))  # Streamlit, psql, manutenção
+DB_CONEXOES_AQUECIMENTO = int(os.getenv("DB_CONEXOES_AQUECIMENTO", "2"))  # Abertas antes do 1º request
 
-# 3. Fábrica de Sessões
+def calcular_pool(workers, max_conexoes, reservadas):
+    """Divide as conexões disponíveis entre os workers: (pool_size, max_overflow) de cada um."""
+    por_worker = max((max_conexoes - reservadas) // workers, 1)
+    max_overflow = por_worker // 4
+    return max(por_worker - max_overflow, 1), max_overflow
+
+# 3. Criação do Motor Assíncrono
+opcoes_engine = {}
+if DB_MAX_CONEXOES:
+    pool_size, max_overflow = calcular_pool(WORKERS, int(DB_MAX_CONEXOES), DB_CONEXOES_RESERVADAS)
+    opcoes_engine = dict(pool_size=pool_size, max_overflow=max_overflow)
+if not DATABASE_URL.startswith("sqlite"):
+    opcoes_engine["pool_pre_ping"] = True
+engine = create_async_engine(DATABASE_URL, echo=True, **opcoes_engine)
+
+# Tamanho efetivo do pool, lido do próprio engine (StaticPool, do SQLite em memória, tem uma
+# conexão só). É daqui que saem o aquecimento e as cotas de admissão (backend/admissao.py)
+POOL_SIZE = engine.pool.size() if hasattr(engine.pool, "size") else 1
+MAX_OVERFLOW = max(getattr(engine.pool, "_max_overflow", 0), 0)
+CONEXOES_POOL = POOL_SIZE + MAX_OVERFLOW
+
+# 4. Fábrica de Sessões
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -27,7 +59,55 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
-# 4. Dependência para injetar o banco nas rotas
+# 5. Dependência para injetar o banco nas rotas
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+# 6. Inicialização segura com vários workers
+# Uma trava por finalidade: advisory lock (chave) no PostgreSQL, lock de arquivo nos demais
+LOCKS = {"ddl": 2024_0001, "arquivamento": 2024_0002}
+PASTA_LOCKS = os.getenv("LOCK_DIR", tempfile.gettempdir())
+
+async def executar_com_lock(nome, fn, *args):
+    """
+    Executa `fn` (via run_sync, numa transação) com exclusão mútua entre workers.
+    Quem chega depois espera a trava e encontra o trabalho feito.
+    """
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": LOCKS[nome]})
+            return await conn.run_sync(fn, *args)
+    try:
+        import fcntl  # Só existe em Unix; no PostgreSQL a API não precisa dele
+    except ImportError:
+        # Windows: sem flock, só para desenvolvimento local com um worker
+        async with engine.begin() as conn:
+            return await conn.run_sync(fn, *args)
+    with open(os.path.join(PASTA_LOCKS, f"cecomp_{nome}.lock"), "w") as arquivo:
+        await asyncio.to_thread(fcntl.flock, arquivo, fcntl.LOCK_EX)
+        try:
+            async with engine.begin() as conn:
+                return await conn.run_sync(fn, *args)
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+async def executar_ddl(fn, *args):
+    """DDL de inicialização: um worker cria o schema, os demais encontram o create_all sem nada a fazer."""
+    return await executar_com_lock("ddl", fn, *args)
+
+async def aquecer_pool(quantidade=DB_CONEXOES_AQUECIMENTO):
+    """Abre algumas conexões do pool (DB_CONEXOES_AQUECIMENTO) antes do worker receber tráfego."""
+    quantidade = max(min(quantidade, POOL_SIZE), 0)
+    async def abrir():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    conexoes = await asyncio.gather(*(abrir() for _ in range(quantidade)), return_exceptions=True)
+    erros = [c for c in conexoes if isinstance(c, Exception)]
+    for conn in conexoes:
+        if not isinstance(conn, Exception):
+            await conn.close()  # Volta para o pool, já aberta
+    if erros:
+        raise erros[0]
@@ -0,0 +1,69 @@
+import os
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional, Tuple
+
+from backend import models
+
+# Fase usada quando a modalidade ainda não tem fluxo cadastrado
+FASE_PADRAO = "Início"
+
+# Validade de cada fluxo no cache de um worker (alterações feitas em outros workers)
+FLUXOS_TTL_S = float(os.getenv("FLUXOS_TTL_S", "60"))
+
+class Fluxo:
+    """Fases ordenadas de uma modalidade, com as transições já calculadas."""
+
+    def __init__(self, fases: List[str]):
+        self.fases = tuple(fases)
+        self.inicial = self.fases[0] if self.fases else FASE_PADRAO
+        self.proxima = dict(zip(self.fases, self.fases[1:]))
+        self.anterior = dict(zip(self.fases[1:], self.fases))
+
+    def destinos_validos(self, fase: str) -> List[str]:
+        """Fases para onde um processo em `fase` pode ir (avançar ou voltar um passo)."""
+        return [f for f in (self.anterior.get(fase), self.proxima.get(fase)) if f]
+
+class MapaTransicoes:
+    """
+    Cache em memória dos fluxos por modalidade. Carregado no startup com uma única
+    consulta (selectinload) e atualizado quando o fluxo de uma modalidade muda neste worker.
+    Cada worker tem o seu mapa; por isso cada entrada vale no máximo FLUXOS_TTL_S segundos,
+    e uma alteração feita em outro worker (ou pelo Streamlit) chega a todos nesse prazo.
+    """
+
+    def __init__(self, ttl: float = FLUXOS_TTL_S):
+        self.ttl = ttl
+        self._fluxos: Dict[int, Tuple[Fluxo, float]] = {}  # modalidade_id -> (fluxo, carregado_em)
+
+    def atualizar(self, modalidade: models.Modalidade) -> Fluxo:
+        fluxo = Fluxo([f.nome for f in modalidade.fases])
+        self._fluxos[modalidade.id] = (fluxo, time.monotonic())
+        return fluxo
+
+    async def carregar(self, db: AsyncSession):
+        stmt = select(models.Modalidade).options(selectinload(models.Modalidade.fases))
+        result = await db.execute(stmt)
+        agora = time.monotonic()
+        self._fluxos = {m.id: (Fluxo([f.nome for f in m.fases]), agora) for m in result.scalars().all()}
+
+    async def obter(self, db: AsyncSession, modalidade_id: int) -> Optional[Fluxo]:
+        """Devolve o fluxo do cache; entradas ausentes ou vencidas são relidas do banco."""
+        entrada = self._fluxos.get(modalidade_id)
+        if entrada and time.monotonic() - entrada[1] < self.ttl:
+            return entrada[0]
+        stmt = (
+            select(models.Modalidade)
+            .options(selectinload(models.Modalidade.fases))
+            .filter_by(id=modalidade_id)
+        )
+        result = await db.execute(stmt)
+        modalidade = result.scalars().first()
+        if modalidade is None:
+            self._fluxos.pop(modalidade_id, None)
+            return None
+        return self.atualizar(modalidade)
+
+mapa_transicoes = MapaTransicoes()
@@ -1,34 +1,107 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
 from fastapi import FastAPI, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import selectinload
 from typing import List
 
 # Importações internas do nosso projeto
 # O 'backend.' é necessário porque estamos rodando da raiz
-from backend.database import engine, Base, get_db
+from backend.database import (
+    engine, Base, get_db, AsyncSessionLocal, sincronizar_schema,
+    executar_ddl, executar_com_lock, aquecer_pool, POOL_SIZE, MAX_OVERFLOW
+)
 from backend import models, schemas
+import regras_processos
+from backend.fluxos import mapa_transicoes, FASE_PADRAO
+from backend.admissao import LIMITES, limite_escrita, limite_leitura, limite_feed, limite_long_poll
+
+# Arquivamento: dias em "Finalizado" antes de sair do conjunto ativo, e intervalo do job
+ARQUIVAR_APOS_DIAS = int(os.getenv("ARQUIVAR_APOS_DIAS", "30"))
+ARQUIVAR_INTERVALO_HORAS = float(os.getenv("ARQUIVAR_INTERVALO_HORAS", "24"))
+
+# --- EVENTOS DE CICLO DE VIDA ---
+
+def criar_schema(connection):
+    """Cria as tabelas que faltam e as colunas/índices novos. Em produção, o ideal é usar Alembic."""
+    Base.metadata.create_all(connection)
+    sincronizar_schema(connection, Base.metadata)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Preparação de cada worker antes de receber tráfego: DDL serializada entre os workers,
+    algumas conexões abertas e mapa de fluxos carregado. Modo multi-worker:
+        WEB_CONCURRENCY=4 DB_MAX_CONEXOES=100 uvicorn backend.main:app
+    """
+    await executar_ddl(criar_schema)
+    await aquecer_pool()
+    async with AsyncSessionLocal() as db:
+        await mapa_transicoes.carregar(db)
+    print(f"✅ Worker {os.getpid()} pronto (pool: {POOL_SIZE} + {MAX_OVERFLOW} conexões).")
+    tarefa_arquivamento = asyncio.create_task(loop_arquivamento())
+    yield
+    # Espera o job sair (inclusive de dentro de executar_com_lock) antes de fechar o pool
+    tarefa_arquivamento.cancel()
+    with suppress(asyncio.CancelledError):
+        await tarefa_arquivamento
+    await engine.dispose()
 
 app = FastAPI(
     title="Sistema CECOMP API",
     description="API assíncrona para gestão de processos de compras",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# --- EVENTOS DE CICLO DE VIDA ---
+# --- ARQUIVAMENTO AGENDADO ---
+
+def arquivar_finalizados(connection, dias: int = ARQUIVAR_APOS_DIAS) -> int:
+    """Marca como arquivados os processos finalizados há mais de `dias` dias (regra comum ao Streamlit)."""
+    return regras_processos.arquivar_finalizados(connection, models.Processo.__table__, dias)
 
-@app.on_event("startup")
-async def startup():
+def arquivar_se_devido(connection):
     """
-    Ao iniciar a API, conecta ao banco e cria as tabelas se não existirem.
-    Em produção, o ideal é usar Alembic para migrações.
+    Roda o arquivamento só se nenhum worker o fez no último intervalo. Chamado sob a trava
+    "arquivamento", então a leitura e a gravação de ultima_execucao não disputam entre si.
     """
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Banco de dados conectado e tabelas verificadas.")
+    tarefas = models.TarefaAgendada.__table__
+    agora = datetime.now()
+    ultima = connection.execute(
+        select(tarefas.c.ultima_execucao).where(tarefas.c.nome == "arquivamento")
+    ).scalar()
+    if ultima and agora - ultima < timedelta(hours=ARQUIVAR_INTERVALO_HORAS):
+        return None
+    total = arquivar_finalizados(connection)
+    if ultima is None:
+        connection.execute(tarefas.insert().values(nome="arquivamento", ultima_execucao=agora))
+    else:
+        connection.execute(
+            tarefas.update().where(tarefas.c.nome == "arquivamento").values(ultima_execucao=agora)
+        )
+    return total
+
+async def loop_arquivamento():
+    """Todos os workers verificam periodicamente; o arquivamento roda uma vez por intervalo no total."""
+    verificacao_s = min(ARQUIVAR_INTERVALO_HORAS * 3600, 600)
+    while True:
+        try:
+            total = await executar_com_lock("arquivamento", arquivar_se_devido)
+            if total:
+                print(f"🗄️ {total} processo(s) finalizado(s) arquivado(s).")
+        except Exception as e:
+            print(f"Falha no arquivamento: {e}")
+        await asyncio.sleep(verificacao_s)
 
 # --- ROTAS DE PROCESSOS ---
 
-@app.post("/processos/", response_model=schemas.ProcessoResponse, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/processos/", response_model=schemas.ProcessoResponse, status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limite_escrita)]
+)
 async def criar_processo(processo: schemas.ProcessoCreate, db: AsyncSession = Depends(get_db)):
     """Cadastra um novo processo no banco de dados."""
     
@@ -39,10 +112,11 @@ async def criar_processo(processo: schemas.ProcessoCreate, db: AsyncSession = De
         raise HTTPException(status_code=400, detail="Número SEI já cadastrado.")
 
     # 2. Cria o objeto do modelo
-    # 'Início' é a fase padrão hardcoded por enquanto
+    # A fase inicial vem do fluxo da modalidade (mapa em memória, sem consulta extra)
+    fluxo = await mapa_transicoes.obter(db, processo.modalidade_id)
     novo_processo = models.Processo(
         **processo.dict(),
-        fase_atual="Início" 
+        fase_atual=fluxo.inicial if fluxo else FASE_PADRAO
     )
     
     # 3. Salva no banco
@@ -55,30 +129,134 @@ async def criar_processo(processo: schemas.ProcessoCreate, db: AsyncSession = De
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao salvar: {str(e)}")
 
-@app.get("/processos/", response_model=List[schemas.ProcessoResponse])
-async def listar_processos(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    """Lista todos os processos com paginação simples."""
-    stmt = select(models.Processo).offset(skip).limit(limit)
+@app.get("/processos/", response_model=List[schemas.ProcessoResponse], dependencies=[Depends(limite_leitura)])
+async def listar_processos(
+    skip: int = 0,
+    limit: int = 100,
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Lista os processos ativos com paginação simples (include_archived=true traz o histórico)."""
+    stmt = select(models.Processo)
+    if not include_archived:
+        stmt = stmt.where(models.Processo.arquivado == False)
+    stmt = stmt.order_by(models.Processo.id).offset(skip).limit(limit)
     result = await db.execute(stmt)
     # .scalars().all() converte o resultado bruto do SQL em objetos Python
     return result.scalars().all()
 
+# Teto da espera do long-poll, para não prender conexões HTTP indefinidamente
+ESPERA_MAXIMA_ALTERACOES = 30.0
+INTERVALO_CONSULTA_ALTERACOES = 1.0
+
+@app.get("/processos/changes", response_model=schemas.ProcessoAlteracoes, dependencies=[Depends(limite_long_poll)])
+async def listar_alteracoes(
+    since: int = -1,
+    since_id: int = 0,
+    wait: float = 0.0,
+    limit: int = 500,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Feed de alterações: devolve só os processos inseridos/alterados depois do cursor
+    (`since`, `since_id`), inclusive os arquivados, para o cliente saber que saíram do conjunto ativo.
+    O cursor é o par (seq_alteracao, id) da última linha, então páginas cortadas no meio de um
+    UPDATE em lote (mesmo seq_alteracao) continuam de onde pararam. Só entram números até a
+    versão segura, para nenhuma transação ainda aberta aparecer depois atrás do cursor.
+    Com `wait` > 0 funciona como long-poll: segura a resposta até surgir alteração ou o tempo acabar.
+    """
+    versao_segura = regras_processos.consulta_versao_segura(models.Processo.__table__, engine.dialect.name).scalar_subquery()
+    stmt = (
+        select(models.Processo)
+        .where(tuple_(models.Processo.seq_alteracao, models.Processo.id) > tuple_(since, since_id))
+        .where(models.Processo.seq_alteracao <= versao_segura)
+        .order_by(models.Processo.seq_alteracao, models.Processo.id)
+        .limit(limit)
+    )
+    prazo = asyncio.get_running_loop().time() + min(max(wait, 0.0), ESPERA_MAXIMA_ALTERACOES)
+    while True:
+        # A vaga da cota do feed (e a conexão do pool) só fica ocupada durante a consulta;
+        # close() devolve a conexão sem expirar os objetos já carregados
+        async with limite_feed.ocupar():
+            try:
+                processos = (await db.execute(stmt)).scalars().all()
+            finally:
+                await db.close()
+        if processos or asyncio.get_running_loop().time() >= prazo:
+            break
+        await asyncio.sleep(INTERVALO_CONSULTA_ALTERACOES)
+
+    cursor, cursor_id = (processos[-1].seq_alteracao, processos[-1].id) if processos else (since, since_id)
+    return {"since": since, "since_id": since_id, "cursor": cursor, "cursor_id": cursor_id, "processos": processos}
+
 # --- ROTAS DE MODALIDADES ---
 
-@app.post("/modalidades/", response_model=schemas.ModalidadeResponse)
+@app.post("/modalidades/", response_model=schemas.ModalidadeResponse, dependencies=[Depends(limite_escrita)])
 async def criar_modalidade(modalidade: schemas.ModalidadeCreate, db: AsyncSession = Depends(get_db)):
-    nova_mod = models.Modalidade(**modalidade.dict())
+    nova_mod = models.Modalidade(
+        nome=modalidade.nome,
+        fases=[models.FaseTemplate(nome=f, ordem=i + 1) for i, f in enumerate(modalidade.fases)]
+    )
     db.add(nova_mod)
     await db.commit()
+    mapa_transicoes.atualizar(nova_mod)
     await db.refresh(nova_mod)
     return nova_mod
 
-@app.get("/modalidades/", response_model=List[schemas.ModalidadeResponse])
+async def carregar_modalidade_com_fases(db: AsyncSession, modalidade_id: int) -> models.Modalidade:
+    stmt = (
+        select(models.Modalidade)
+        .options(selectinload(models.Modalidade.fases))
+        .filter_by(id=modalidade_id)
+    )
+    result = await db.execute(stmt)
+    modalidade = result.scalars().first()
+    if not modalidade:
+        raise HTTPException(status_code=404, detail="Modalidade não encontrada.")
+    return modalidade
+
+def montar_fluxo_response(modalidade: models.Modalidade) -> dict:
+    fluxo = mapa_transicoes.atualizar(modalidade)
+    return {
+        "modalidade_id": modalidade.id,
+        "fase_inicial": fluxo.inicial,
+        "fases": modalidade.fases,
+        "proxima": fluxo.proxima,
+        "anterior": fluxo.anterior,
+        "destinos_validos": {fase: fluxo.destinos_validos(fase) for fase in fluxo.fases},
+    }
+
+@app.get("/modalidades/{modalidade_id}/fases", response_model=schemas.FluxoResponse, dependencies=[Depends(limite_leitura)])
+async def listar_fases(modalidade_id: int, db: AsyncSession = Depends(get_db)):
+    """Fluxo de fases da modalidade (fases + fase inicial + transições)."""
+    modalidade = await carregar_modalidade_com_fases(db, modalidade_id)
+    return montar_fluxo_response(modalidade)
+
+@app.put("/modalidades/{modalidade_id}/fases", response_model=schemas.FluxoResponse, dependencies=[Depends(limite_escrita)])
+async def substituir_fases(modalidade_id: int, fases: schemas.FasesUpdate, db: AsyncSession = Depends(get_db)):
+    """Redefine o fluxo da modalidade (admin) e atualiza o mapa de transições."""
+    modalidade = await carregar_modalidade_com_fases(db, modalidade_id)
+    modalidade.fases = [models.FaseTemplate(nome=f, ordem=i + 1) for i, f in enumerate(fases.root)]
+    try:
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao salvar: {str(e)}")
+    return montar_fluxo_response(modalidade)
+
+@app.get("/modalidades/", response_model=List[schemas.ModalidadeResponse], dependencies=[Depends(limite_leitura)])
 async def listar_modalidades(db: AsyncSession = Depends(get_db)):
     stmt = select(models.Modalidade)
     result = await db.execute(stmt)
     return result.scalars().all()
 
+# --- MONITORAMENTO ---
+
+@app.get("/metricas/admissao")
+async def metricas_admissao():
+    """Vagas em uso, fila e rejeições (503) de cada cota do controle de admissão, neste worker."""
+    return {"pid": os.getpid(), "cotas": {nome: limite.metricas() for nome, limite in LIMITES.items()}}
+
 # --- ROTA DE SAÚDE (HEALTH CHECK) ---
 @app.get("/")
 async def root():
@@ -1,16 +1,51 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import AfterValidator, BaseModel, ConfigDict, RootModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Annotated, Optional, List, Dict
 
 # --- SCHEMAS DE MODALIDADE ---
 # Necessário para listar no dropdown do frontend
 
+def validar_fases(fases: List[str]) -> List[str]:
+    """Fluxo com pelo menos uma fase, sem nomes vazios nem repetidos (as transições são por nome)."""
+    fases = [f.strip() for f in fases]
+    if not fases:
+        raise ValueError("O fluxo precisa de pelo menos uma fase.")
+    if not all(fases):
+        raise ValueError("Nome de fase em branco.")
+    repetidas = sorted({f for f in fases if fases.count(f) > 1})
+    if repetidas:
+        raise ValueError(f"Fases repetidas: {', '.join(repetidas)}.")
+    return fases
+
+# Fluxo de fases, na ordem (entrada do cadastro e da redefinição do fluxo)
+ListaFases = Annotated[List[str], AfterValidator(validar_fases)]
+
 class ModalidadeBase(BaseModel):
     nome: str
 
 class ModalidadeCreate(ModalidadeBase):
+    fases: ListaFases
+
+# Corpo do PUT /modalidades/{id}/fases: a lista de fases em si, com a mesma validação
+class FasesUpdate(RootModel[ListaFases]):
     pass
 
+class FaseTemplateResponse(BaseModel):
+    id: int
+    nome: str
+    ordem: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Fluxo completo com as transições pré-calculadas
+class FluxoResponse(BaseModel):
+    modalidade_id: int
+    fase_inicial: str
+    fases: List[FaseTemplateResponse]
+    proxima: Dict[str, str]
+    anterior: Dict[str, str]
+    destinos_validos: Dict[str, List[str]]  # Fase -> fases para onde pode ser movimentado
+
 class ModalidadeResponse(ModalidadeBase):
     id: int
     
@@ -36,6 +71,17 @@ class ProcessoResponse(ProcessoBase):
     id: int
     fase_atual: str
     data_autorizacao: datetime
+    arquivado: bool = False
+    seq_alteracao: int = 0
     
     # Permite que o Pydantic converta o objeto do banco (SQLAlchemy) para JSON
     model_config = ConfigDict(from_attributes=True)
+
+# Resposta do feed de alterações (atualização incremental dos clientes)
+class ProcessoAlteracoes(BaseModel):
+    since: int
+    since_id: int
+    # Enviar como 'since' e 'since_id' na próxima chamada
+    cursor: int
+    cursor_id: int
+    processos: List[ProcessoResponse]
@@ -0,0 +1,9 @@
+from sqlalchemy.orm import selectinload
+from models import Modalidade
+
+# Consultas das telas do app.py que o teste_planos.py mede (quantidade de comandos SQL).
+# Ficam aqui, fora do app.py, para o teste medir exatamente o código que as telas executam.
+
+def listar_modalidades_com_fases(session):
+    """Modalidades com o fluxo já carregado e ordenado (selectinload: 2 comandos, não 1 + N)."""
+    return session.query(Modalidade).options(selectinload(Modalidade.fases)).all()
@@ -1,4 +1,5 @@
 import streamlit as st
+from migracoes import sincronizar_schema  # Reexportado para o app.py
 
 def get_connection():
     # Cria a conexão SQL usando o segredo ou padrão local
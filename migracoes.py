@@ -0,0 +1,28 @@
+from sqlalchemy import inspect, literal, text
+
+# Ajuste de schema sem Alembic, compartilhado pelo Streamlit (database.py) e pela API
+# (backend/database.py). Não importa streamlit nem o backend, para servir aos dois lados.
+
+def sincronizar_schema(connection, metadata):
+    """
+    Complementa o create_all: adiciona colunas e índices novos em tabelas que já existem,
+    sem apagar os dados (o create_all só cria tabelas inteiras).
+    """
+    inspetor = inspect(connection)
+    dialeto = connection.dialect
+    for tabela in metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {c["name"] for c in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes:
+                continue
+            ddl = f"ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {coluna.type.compile(dialeto)}"
+            if coluna.default is not None and coluna.default.is_scalar:
+                padrao = literal(coluna.default.arg, coluna.type).compile(
+                    dialect=dialeto, compile_kwargs={"literal_binds": True}
+                )
+                ddl += f" DEFAULT {padrao}"
+            connection.execute(text(ddl))
+        for indice in tabela.indexes:
+            indice.create(connection, checkfirst=True)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Float, DateTime, Boolean, Index, BigInteger
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
+from regras_processos import FASE_FINAL, configurar_processos  # FASE_FINAL reexportada para o app.py
 
 Base = declarative_base()
 
@@ -28,7 +29,7 @@ class Modalidade(Base):
     __tablename__ = 'modalidades'
     id = Column(Integer, primary_key=True)
     nome = Column(String(100), nullable=False)
-    fases = relationship("FaseTemplate", back_populates="modalidade", cascade="all, delete-orphan")
+    fases = relationship("FaseTemplate", back_populates="modalidade", cascade="all, delete-orphan", order_by="FaseTemplate.ordem")
 
 class FaseTemplate(Base):
     __tablename__ = 'fases_template'
@@ -38,6 +39,9 @@ class FaseTemplate(Base):
     modalidade_id = Column(Integer, ForeignKey('modalidades.id'))
     modalidade = relationship("Modalidade", back_populates="fases")
 
+    # Busca do fluxo de uma modalidade já na ordem (sem ordenação em memória)
+    __table_args__ = (Index("ix_fases_template_modalidade_ordem", "modalidade_id", "ordem"),)
+
 class Processo(Base):
     __tablename__ = 'processos'
     id = Column(Integer, primary_key=True)
@@ -50,3 +54,14 @@ class Processo(Base):
     fase_atual = Column(String(100))
     setor_origem_id = Column(Integer, ForeignKey('setores.id'))
     setor_origem = relationship("Setor", back_populates="processos")
+
+    # Arquivamento (processos finalizados saem das listagens padrão)
+    data_finalizacao = Column(DateTime, nullable=True)
+    arquivado = Column(Boolean, default=False)
+
+    # Feed de alterações: número crescente carimbado a cada INSERT/UPDATE (0 = anterior ao feed).
+    # Um UPDATE em lote dá o mesmo número a várias linhas; o desempate é pelo id.
+    seq_alteracao = Column(BigInteger, default=0)
+
+# Índices e carimbo do feed de alterações (mesmas regras do Streamlit e da API)
+configurar_processos(Processo)
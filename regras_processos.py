@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from sqlalchemy import BigInteger, Index, Text, cast, event, func, select
+
+# Regras da tabela de processos compartilhadas pelo Streamlit (models.py) e pela API
+# (backend/models.py): índices, carimbo do feed de alterações e arquivamento. Recebem a
+# Table (ou a classe) de cada lado e não importam streamlit nem o backend.
+
+# Fase que encerra o fluxo; processos nela são arquivados após o prazo configurado
+FASE_FINAL = "Finalizado"
+
+# SQLite: um escritor por vez, então MAX + 1 calculado dentro da escrita segue a ordem de commit.
+# PostgreSQL: números de sequência são entregues antes do commit e ficariam visíveis fora de ordem;
+# por isso o carimbo é o id da transação (xid), e os leitores só avançam até a transação aberta
+# mais antiga (pg_snapshot_xmin) — tudo abaixo dela já terminou e não muda mais.
+def proxima_seq_alteracao(tabela, dialeto):
+    """Expressão SQL que gera o próximo número do feed de alterações."""
+    if dialeto == "postgresql":
+        return cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+    # Alias evita que o subselect seja correlacionado à própria tabela no UPDATE
+    anterior = tabela.alias("seq_anterior")
+    return select(func.coalesce(func.max(anterior.c.seq_alteracao), 0) + 1).scalar_subquery()
+
+def consulta_versao_segura(tabela, dialeto):
+    """
+    Maior número do feed que um leitor pode usar como cursor sem perder linhas: nenhuma
+    escrita ainda não confirmada pode receber um número menor ou igual a ele.
+    """
+    versao = func.coalesce(func.max(tabela.c.seq_alteracao), 0)
+    if dialeto == "postgresql":
+        horizonte = cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+        versao = func.least(versao, horizonte - 1)
+    return select(versao)
+
+def configurar_processos(processo):
+    """Índices e carimbo do feed de alterações da classe mapeada `processo`."""
+    tabela = processo.__table__
+
+    # Índice parcial só com os processos ativos: listagens padrão não varrem o arquivo
+    Index(
+        "ix_processos_ativos", tabela.c.id,
+        sqlite_where=tabela.c.arquivado == False,
+        postgresql_where=tabela.c.arquivado == False,
+    )
+
+    # Cursor do feed de alterações: (seq_alteracao, id)
+    Index("ix_processos_alteracao", tabela.c.seq_alteracao, tabela.c.id)
+
+    @event.listens_for(processo, "before_insert")
+    @event.listens_for(processo, "before_update")
+    def carimbar_alteracao(mapper, connection, target):
+        target.seq_alteracao = proxima_seq_alteracao(tabela, connection.dialect.name)
+
+def arquivar_finalizados(connection, tabela, dias):
+    """Marca como arquivados os processos finalizados há mais de `dias` dias."""
+    limite = datetime.now() - timedelta(days=dias)
+    stmt = (
+        tabela.update()
+        .where(tabela.c.fase_atual == FASE_FINAL)
+        .where(tabela.c.arquivado == False)
+        .where(func.coalesce(tabela.c.data_finalizacao, tabela.c.data_autorizacao) <= limite)
+        .values(arquivado=True, seq_alteracao=proxima_seq_alteracao(tabela, connection.dialect.name))
+    )
+    return connection.execute(stmt).rowcount
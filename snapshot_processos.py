@@ -0,0 +1,84 @@
+import threading
+import pandas as pd
+import streamlit as st
+from models import Processo, Setor, Modalidade
+from regras_processos import consulta_versao_segura
+
+# --- SNAPSHOT COMPARTILHADO DA LISTA DE PROCESSOS ---
+# Todas as sessões do Streamlit leem o mesmo DataFrame, identificado pela versão dos dados
+# (maior seq_alteracao já confirmado, ver consulta_versao_segura). Uma nova versão é montada
+# uma única vez, a partir da anterior + delta do feed de alterações até essa versão.
+# IMPORTANTE: o DataFrame devolvido é compartilhado; filtre criando cópias, nunca altere no lugar.
+
+def mesclar_alteracoes(df_cache, df_delta):
+    """Aplica o delta do feed de alterações (linhas novas ou alteradas) sobre o DataFrame em cache."""
+    if df_cache is None:
+        return df_delta
+    if df_delta.empty:
+        return df_cache
+    mantidas = df_cache[~df_cache['id'].isin(df_delta['id'])]
+    return pd.concat([mantidas, df_delta], ignore_index=True).sort_values('id', ignore_index=True)
+
+def consulta_processos(session):
+    """Query principal (join com Setor e Modalidade)."""
+    return session.query(
+        Processo.id, Processo.numero_sei, Processo.objeto,
+        Processo.valor_previsto, Processo.fase_atual, Processo.data_autorizacao,
+        Processo.arquivado, Processo.seq_alteracao,
+        Setor.nome.label("setor"), Modalidade.nome.label("modalidade")
+    ).outerjoin(Setor, Processo.setor_origem_id == Setor.id)\
+     .outerjoin(Modalidade, Processo.modalidade_id == Modalidade.id)
+
+def versao_dados(session):
+    """
+    Versão segura dos dados: MAX no índice de seq_alteracao, limitado (no PostgreSQL) à
+    transação aberta mais antiga, para o cursor nunca passar de uma escrita ainda não confirmada.
+    """
+    return session.execute(consulta_versao_segura(Processo.__table__, session.bind.dialect.name)).scalar()
+
+class SnapshotProcessos:
+    """Guarda a última versão montada de cada visão (ativos / com arquivados)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}  # incluir_arquivados -> (versao, DataFrame)
+
+    def obter(self, session, incluir_arquivados=False):
+        versao = versao_dados(session)
+        atual = self._frames.get(incluir_arquivados)
+        if atual and atual[0] >= versao:
+            return atual[1]
+
+        # Single-flight: só uma sessão consulta o banco; as demais esperam e reaproveitam
+        with self._lock:
+            atual = self._frames.get(incluir_arquivados)
+            if atual and atual[0] >= versao:
+                return atual[1]
+            atual = self._montar(session, incluir_arquivados, atual, versao)
+            self._frames[incluir_arquivados] = atual
+            return atual[1]
+
+    def _montar(self, session, incluir_arquivados, anterior, versao):
+        query = consulta_processos(session)
+        if anterior is None:
+            df_cache = None
+            # Carga inicial só do conjunto ativo (índice parcial ix_processos_ativos)
+            if not incluir_arquivados:
+                query = query.filter(Processo.arquivado == False)
+        else:
+            cursor, df_cache = anterior
+            query = query.filter(Processo.seq_alteracao > cursor)
+        # Só até a versão segura: o que vier depois entra na próxima montagem
+        query = query.filter(Processo.seq_alteracao <= versao)
+
+        df_delta = pd.read_sql(query.statement, session.bind)
+        df = mesclar_alteracoes(df_cache, df_delta)
+        if not incluir_arquivados:
+            df = df[~df['arquivado'].astype(bool)].reset_index(drop=True)
+        # Tudo até a versão segura já estava confirmado quando o delta foi lido
+        return versao, df
+
+@st.cache_resource
+def obter_snapshot_processos():
+    """Instância única por processo do Streamlit (compartilhada entre todas as sessões)."""
+    return SnapshotProcessos()
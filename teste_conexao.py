@@ -1,35 +1,234 @@
+"""
+Diagnóstico de conexão e desempenho do banco (SQLite ou PostgreSQL).
+
+    python teste_conexao.py                      # URL de .streamlit/secrets.toml
+    python teste_conexao.py --sqlite             # banco local do Streamlit (central_compras.db)
+    python teste_conexao.py --url postgresql+asyncpg://... --pings 100 --concorrencia 10
+    python teste_conexao.py --json > diagnostico.json
+
+Separa problemas de rede/pool (conexão, aquecimento, latência de ida e volta) de consultas
+lentas (vazão e latência das consultas quentes reais sob concorrência).
+"""
+import argparse
 import asyncio
-import streamlit as st
+import json
+import os
+import statistics
+import sys
+import time
+from sqlalchemy import func, select, text
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy import text
-
-# 1. Tenta pegar a URL dos segredos (Source [2])
-try:
-    DATABASE_URL = st.secrets["database"]["url"]
-    print("✅ Segredo encontrado: URL carregada.")
-except Exception as e:
-    print(f"❌ Erro: Não foi possível ler .streamlit/secrets.toml. Detalhes: {e}")
-    exit()
-
-async def verificar():
-    print("🔄 Tentando conectar ao PostgreSQL...")
-    
-    # 2. Configura o motor assíncrono (Source [3])
+from models import FaseTemplate, Processo, Usuario
+
+URL_SQLITE_STREAMLIT = "sqlite+aiosqlite:///central_compras.db"
+
+# Consultas quentes reais (mesmos comandos das telas e da API)
+CONSULTAS_QUENTES = {
+    "sei_duplicado": select(Processo.id).filter_by(numero_sei="0"),
+    "login": select(Usuario.id).filter_by(login="admin", senha="123"),
+    "fluxo_modalidade": select(FaseTemplate.nome).filter_by(modalidade_id=1).order_by(FaseTemplate.ordem),
+    "lista_ativos": select(Processo).where(Processo.arquivado == False).order_by(Processo.id).limit(100),
+    "versao_dados": select(func.max(Processo.seq_alteracao)),
+}
+
+CONFIGURACOES = {
+    "sqlite": ["journal_mode", "synchronous", "cache_size", "page_size", "busy_timeout", "foreign_keys", "mmap_size"],
+    "postgresql": [
+        "server_version", "max_connections", "shared_buffers", "work_mem",
+        "effective_cache_size", "random_page_cost", "statement_timeout", "ssl",
+    ],
+}
+
+def obter_url(args):
+    """Prioridade: --url, --sqlite, .streamlit/secrets.toml, DATABASE_URL, banco local do Streamlit."""
+    if args.url:
+        return args.url
+    if args.sqlite:
+        return URL_SQLITE_STREAMLIT
     try:
-        engine = create_async_engine(DATABASE_URL, echo=False)
-        
+        import streamlit as st
+        return st.secrets["database"]["url"]
+    except Exception as e:
+        log(args, f"⚠️ Não foi possível ler .streamlit/secrets.toml ({e}). Usando DATABASE_URL ou o SQLite local.")
+        return os.getenv("DATABASE_URL", URL_SQLITE_STREAMLIT)
+
+def url_assincrona(url):
+    """Converte URLs síncronas (formato do st.connection) para o driver assíncrono."""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith(("postgresql://", "postgres://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+def inteiro_positivo(valor):
+    """Tipo do argparse para contagens: com 0 não haveria amostras para os percentis."""
+    numero = int(valor)
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1 (recebido {valor})")
+    return numero
+
+def log(args, mensagem):
+    if not args.json:
+        print(mensagem)
+
+def percentis(amostras_ms):
+    ordenadas = sorted(amostras_ms)
+
+    def p(q):
+        return round(ordenadas[min(int(q * len(ordenadas)), len(ordenadas) - 1)], 3)
+
+    return {
+        "n": len(ordenadas), "min": round(ordenadas[0], 3), "p50": p(0.50),
+        "p95": p(0.95), "p99": p(0.99), "max": round(ordenadas[-1], 3),
+        "media": round(statistics.fmean(ordenadas), 3),
+    }
+
+async def medir_conexao(engine):
+    """Primeira conexão (DNS + TCP + TLS + autenticação) e versão do servidor."""
+    inicio = time.perf_counter()
+    async with engine.connect() as conn:
+        conectado = time.perf_counter()
+        if engine.dialect.name == "postgresql":
+            versao = (await conn.execute(text("SELECT version()"))).scalar()
+        else:
+            versao = "SQLite " + (await conn.execute(text("SELECT sqlite_version()"))).scalar()
+    return {"conexao_ms": round((conectado - inicio) * 1000, 3), "versao": versao}
+
+async def medir_aquecimento(engine, quantidade):
+    """Abre `quantidade` conexões ao mesmo tempo, como no aquecimento do pool da API."""
+    async def abrir():
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    inicio = time.perf_counter()
+    conexoes = await asyncio.gather(*(abrir() for _ in range(quantidade)))
+    decorrido = time.perf_counter() - inicio
+    for conn in conexoes:
+        await conn.close()
+    return {"conexoes": quantidade, "total_ms": round(decorrido * 1000, 3)}
+
+async def medir_ping(engine, pings):
+    """Latência de ida e volta (SELECT 1) numa conexão já aberta: isola rede de consulta."""
+    amostras = []
+    async with engine.connect() as conn:
+        for _ in range(pings):
+            inicio = time.perf_counter()
+            await conn.execute(text("SELECT 1"))
+            amostras.append((time.perf_counter() - inicio) * 1000)
+    return percentis(amostras)
+
+async def medir_consulta(engine, stmt, concorrencia, repeticoes):
+    """Vazão e latência de uma consulta com `concorrencia` tarefas, cada uma com sua conexão."""
+    amostras = []
+
+    async def tarefa():
         async with engine.connect() as conn:
-            # Executa um comando simples de teste
-            result = await conn.execute(text("SELECT version();"))
-            versao = result.scalar()
-            print(f"🎉 SUCESSO! Conectado ao: {versao}")
-            
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                (await conn.execute(stmt)).fetchall()
+                amostras.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(tarefa() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+    return {"vazao_por_s": round(len(amostras) / decorrido, 1), "latencia_ms": percentis(amostras)}
+
+async def ler_configuracoes(engine):
+    """PRAGMAs efetivos (SQLite) ou parâmetros do servidor (PostgreSQL)."""
+    nomes = CONFIGURACOES.get(engine.dialect.name, [])
+    valores = {}
+    async with engine.connect() as conn:
+        for nome in nomes:
+            comando = f"PRAGMA {nome}" if engine.dialect.name == "sqlite" else f"SHOW {nome}"
+            try:
+                valores[nome] = (await conn.execute(text(comando))).scalar()
+            except Exception as e:
+                valores[nome] = f"erro: {e.__class__.__name__}"
+    return valores
+
+def diagnosticar(resultado):
+    """Leitura rápida dos números: rede/pool x consulta lenta."""
+    dicas = []
+    ping = resultado["ping_ms"]["p50"]
+    if resultado["conexao"]["conexao_ms"] > 500:
+        dicas.append("Conexão inicial lenta: rede/TLS/autenticação. O pool (e o aquecimento) evita pagar isso por requisição.")
+    if ping > 20:
+        dicas.append(f"Latência de rede alta (p50 {ping} ms por ida e volta): cada consulta paga pelo menos isso.")
+    aquecimento = resultado["aquecimento"]
+    if aquecimento["total_ms"] > 4 * resultado["conexao"]["conexao_ms"] + 100:
+        dicas.append("Aquecimento do pool lento: o servidor/pooler está limitando conexões simultâneas.")
+    for nome, medida in resultado["consultas"].items():
+        if "erro" in medida:
+            continue
+        p50 = medida["latencia_ms"]["p50"]
+        if p50 > max(3 * ping, ping + 10):
+            dicas.append(f"Consulta '{nome}' lenta (p50 {p50} ms contra {ping} ms de rede): veja o plano em teste_planos.py.")
+    return dicas or ["Nada fora do normal."]
+
+async def executar(args):
+    url = url_assincrona(obter_url(args))
+    engine = create_async_engine(url, echo=False, pool_size=args.concorrencia, max_overflow=0)
+    log(args, f"🔄 Conectando ({engine.dialect.name})...")
+    try:
+        resultado = {"dialeto": engine.dialect.name, "parametros": vars(args)}
+        resultado["conexao"] = await medir_conexao(engine)
+        log(args, f"🎉 Conectado ao: {resultado['conexao']['versao']} em {resultado['conexao']['conexao_ms']} ms")
+
+        # Descarta as conexões para o aquecimento medir o custo real de abrir o pool
         await engine.dispose()
-        return True
+        resultado["aquecimento"] = await medir_aquecimento(engine, args.concorrencia)
+        log(args, f"🔥 Pool aquecido: {args.concorrencia} conexões em {resultado['aquecimento']['total_ms']} ms")
+
+        resultado["ping_ms"] = await medir_ping(engine, args.pings)
+        log(args, f"📶 Ida e volta (SELECT 1, {args.pings}x): {resultado['ping_ms']}")
+
+        resultado["consultas"] = {}
+        log(args, f"⚡ Consultas quentes ({args.concorrencia} tarefas x {args.repeticoes} repetições):")
+        for nome, stmt in CONSULTAS_QUENTES.items():
+            try:
+                medida = await medir_consulta(engine, stmt, args.concorrencia, args.repeticoes)
+                log(args, f"   {nome}: {medida['vazao_por_s']}/s | {medida['latencia_ms']}")
+            except Exception as e:
+                medida = {"erro": str(e).splitlines()[0]}
+                log(args, f"   {nome}: ❌ {medida['erro']}")
+            resultado["consultas"][nome] = medida
+
+        resultado["configuracoes"] = await ler_configuracoes(engine)
+        log(args, "⚙️ Configurações efetivas:")
+        for nome, valor in resultado["configuracoes"].items():
+            log(args, f"   {nome} = {valor}")
+
+        resultado["diagnostico"] = diagnosticar(resultado)
+        log(args, "🩺 Diagnóstico:")
+        for dica in resultado["diagnostico"]:
+            log(args, f"   - {dica}")
+        return resultado
+    finally:
+        await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnóstico de conexão e desempenho do banco.")
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--url", help="URL do banco (padrão: .streamlit/secrets.toml)")
+    origem.add_argument("--sqlite", action="store_true", help="Usa o banco local do Streamlit (central_compras.db)")
+    parser.add_argument("--pings", type=inteiro_positivo, default=50, help="Quantidade de SELECT 1 para a latência")
+    parser.add_argument("--concorrencia", type=inteiro_positivo, default=5, help="Tarefas simultâneas nas consultas quentes")
+    parser.add_argument("--repeticoes", type=inteiro_positivo, default=20, help="Execuções de cada consulta por tarefa")
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    try:
+        resultado = asyncio.run(executar(args))
     except Exception as e:
-        print(f"❌ FALHA NA CONEXÃO. Verifique sua URL e senha.\nErro técnico: {e}")
-        return False
+        if args.json:
+            print(json.dumps({"erro": str(e)}, ensure_ascii=False))
+        else:
+            print(f"❌ FALHA NA CONEXÃO. Verifique sua URL e senha.\nErro técnico: {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
 
 if __name__ == "__main__":
-    # Executa o loop assíncrono (Source [4])
-    asyncio.run(verificar())
+    main()
@@ -0,0 +1,110 @@
+"""
+Orçamento de inicialização (cold start) do app Streamlit e da API.
+
+    python teste_inicializacao.py
+
+Mede com `python -X importtime` o caminho do login (auth/database/models) e a importação
+do backend, além do tempo da subida da API (lifespan) até a primeira resposta. Sai com código 1 se algum
+orçamento estourar ou se um módulo pesado voltar a ser importado no caminho do login.
+Os orçamentos (ms) podem ser ajustados por variável de ambiente para máquinas mais lentas.
+"""
+import ast
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+# A API é medida fora da raiz (sem ler .streamlit/secrets.toml) e com um SQLite novo numa
+# pasta temporária: o que interessa aqui é o custo de importação e de subida, não a rede.
+# Arquivo, e não :memory:, porque cada conexão do pool teria o seu próprio banco vazio.
+PASTA_BACKEND = tempfile.mkdtemp()
+AMBIENTE_BACKEND = dict(
+    os.environ, PYTHONPATH=RAIZ, LOCK_DIR=PASTA_BACKEND,
+    DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(PASTA_BACKEND, 'inicializacao.db')}",
+)
+
+ORCAMENTO_LOGIN_MS = float(os.getenv("ORCAMENTO_LOGIN_MS", "1500"))
+ORCAMENTO_BACKEND_MS = float(os.getenv("ORCAMENTO_BACKEND_MS", "2000"))
+ORCAMENTO_PRIMEIRA_RESPOSTA_MS = float(os.getenv("ORCAMENTO_PRIMEIRA_RESPOSTA_MS", "500"))
+
+# Módulos que só as telas internas podem carregar (nunca o login nem o topo do app.py)
+MODULOS_PESADOS = {"pandas", "numpy", "pyarrow", "snapshot_processos"}
+
+def medir_importacao(codigo, cwd=RAIZ, env=None):
+    """Roda `codigo` num interpretador novo com -X importtime: (tempo total em ms, módulos importados)."""
+    # Primeira execução só gera os .pyc, para a medição não incluir compilação
+    subprocess.run([sys.executable, "-c", codigo], cwd=cwd, env=env, capture_output=True)
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stderr
+
+    total_us, modulos = 0, set()
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, cumulativo, nome = linha[len("import time:"):].split("|")
+        modulos.add(nome.strip())
+        if not nome.startswith("  "):  # Só módulos de primeiro nível, para não contar em dobro
+            total_us += int(cumulativo)
+    return total_us / 1000, modulos
+
+def importacoes_topo_app():
+    """Módulos importados no nível superior do app.py (executados antes da tela de login)."""
+    with open(os.path.join(RAIZ, "app.py"), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    nomes = set()
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            nomes.update(a.name.split(".")[0] for a in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module:
+            nomes.add(no.module.split(".")[0])
+    return nomes
+
+def medir_primeira_resposta(cwd):
+    """Tempo (ms) da subida da API (lifespan: schema, aquecimento do pool e fluxos) até a primeira resposta."""
+    codigo = (
+        "import time; from backend.main import app; from fastapi.testclient import TestClient\n"
+        "t = time.perf_counter()\n"
+        "with TestClient(app) as c:\n"
+        "    r = c.get('/')\n"
+        "    print('primeira_resposta_ms', (time.perf_counter() - t) * 1000 if r.status_code == 200 else -1)"
+    )
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=cwd, env=AMBIENTE_BACKEND, capture_output=True, text=True, check=True
+    )
+    # O engine da API ecoa o SQL no stdout; a medida vem na linha marcada
+    linha = next(l for l in saida.stdout.splitlines() if l.startswith("primeira_resposta_ms "))
+    return float(linha.split()[1])
+
+def verificar(nome, ok, detalhe):
+    print(f"{'✅' if ok else '❌'} {nome}: {detalhe}")
+    return [] if ok else [nome]
+
+if __name__ == "__main__":
+    falhas = []
+
+    pesados_app = importacoes_topo_app() & MODULOS_PESADOS
+    falhas += verificar("Topo do app.py sem módulos pesados", not pesados_app, sorted(pesados_app) or "ok")
+
+    tempo, modulos = medir_importacao("import auth, database, models")
+    pesados_login = modulos & MODULOS_PESADOS
+    falhas += verificar("Caminho do login sem módulos pesados", not pesados_login, sorted(pesados_login) or "ok")
+    falhas += verificar("Importação do login", tempo <= ORCAMENTO_LOGIN_MS, f"{tempo:.0f} ms (orçamento {ORCAMENTO_LOGIN_MS:.0f} ms)")
+
+    tempo, modulos = medir_importacao("import backend.main", cwd=PASTA_BACKEND, env=AMBIENTE_BACKEND)
+    falhas += verificar("Backend sem pandas", "pandas" not in modulos, "ok" if "pandas" not in modulos else "pandas importado")
+    falhas += verificar("Importação do backend", tempo <= ORCAMENTO_BACKEND_MS, f"{tempo:.0f} ms (orçamento {ORCAMENTO_BACKEND_MS:.0f} ms)")
+
+    tempo = medir_primeira_resposta(PASTA_BACKEND)
+    falhas += verificar(
+        "Primeira resposta da API", 0 <= tempo <= ORCAMENTO_PRIMEIRA_RESPOSTA_MS,
+        f"{tempo:.0f} ms (orçamento {ORCAMENTO_PRIMEIRA_RESPOSTA_MS:.0f} ms)"
+    )
+
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam: {', '.join(falhas)}")
+        sys.exit(1)
+    print("\n🎉 Inicialização dentro do orçamento.")
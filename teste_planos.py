@@ -0,0 +1,171 @@
+"""
+Verificação dos planos das consultas quentes (regressão de índices e de N+1).
+
+    python teste_planos.py             -> SQLite em memória, populado com dados de exemplo
+    python teste_planos.py --postgres  -> EXPLAIN no PostgreSQL de .streamlit/secrets.toml (somente leitura)
+
+No SQLite rodam todas as verificações: o índice esperado de cada consulta e o limite de
+comandos SQL por tela. No PostgreSQL (o banco da API, criado por backend/models.py) só
+roda o EXPLAIN, e as consultas sobre tabelas que não existem lá (como `usuarios`, que só o
+Streamlit tem) aparecem como puladas.
+
+Sai com código 1 se alguma consulta deixar de usar o índice esperado ou se alguma
+tela passar do limite de comandos SQL.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from sqlalchemy import create_engine, event, inspect, select, text, tuple_
+from sqlalchemy.orm import Session
+from models import Base, Setor, Modalidade, FaseTemplate, Processo, Usuario, FASE_FINAL
+from consultas import listar_modalidades_com_fases
+
+# 1. Consultas quentes e o índice que cada uma deve usar no SQLite
+#    (no PostgreSQL os nomes vêm do backend, então basta não haver Seq Scan na tabela)
+CONSULTAS = [
+    (
+        "SEI duplicado (modal_novo_processo / criar_processo)",
+        select(Processo).filter_by(numero_sei="SEI-000500"),
+        "processos", "sqlite_autoindex_processos_1",
+    ),
+    (
+        "Login (auth.verificar_login)",
+        select(Usuario).filter_by(login="usuario10", senha="123"),
+        "usuarios", "sqlite_autoindex_usuarios_1",
+    ),
+    (
+        "Fluxo ordenado (FaseTemplate por modalidade)",
+        select(FaseTemplate).filter_by(modalidade_id=3).order_by(FaseTemplate.ordem),
+        "fases_template", "ix_fases_template_modalidade_ordem",
+    ),
+    (
+        "Lista de processos ativos (listar_processos)",
+        select(Processo).where(Processo.arquivado == False).order_by(Processo.id).offset(0).limit(100),
+        "processos", "ix_processos_ativos",
+    ),
+    (
+        "Feed de alterações (/processos/changes)",
+        select(Processo)
+        .where(tuple_(Processo.seq_alteracao, Processo.id) > tuple_(1500, 0))
+        .order_by(Processo.seq_alteracao, Processo.id).limit(500),
+        "processos", "ix_processos_alteracao",
+    ),
+]
+
+# 2. Limite de comandos SQL por tela (independe da quantidade de registros)
+LIMITE_COMANDOS = {
+    "Modalidades com fases (admin e modal Novo Processo)": 2,
+    "Gestão de Processos (1ª carga)": 2,
+    "Gestão de Processos (rerun sem alteração)": 1,
+}
+
+def popular(session):
+    """Massa de dados próxima da real: vários núcleos, modalidades com fluxo completo e processos arquivados."""
+    setores = [Setor(nome=f"Núcleo {i}") for i in range(12)]
+    session.add_all(setores)
+    session.flush()
+    for i in range(50):
+        session.add(Usuario(nome=f"Usuário {i}", login=f"usuario{i}", senha="123", setor_id=setores[i % 12].id))
+    for m in range(5):
+        fases = [FaseTemplate(nome=f"Fase {i}", ordem=i + 1) for i in range(19)]
+        fases.append(FaseTemplate(nome=FASE_FINAL, ordem=20))
+        session.add(Modalidade(nome=f"Modalidade {m}", fases=fases))
+    session.flush()
+    for i in range(2000):
+        finalizado = i % 2 == 0
+        session.add(Processo(
+            numero_sei=f"SEI-{i:06d}", objeto=f"Objeto {i}", valor_previsto=1000.0 + i,
+            modalidade_id=i % 5 + 1, setor_origem_id=setores[i % 12].id,
+            fase_atual=FASE_FINAL if finalizado else "Fase 3",
+            data_finalizacao=datetime.now() if finalizado else None, arquivado=finalizado,
+        ))
+    session.commit()
+    session.execute(text("ANALYZE"))
+
+def plano(connection, stmt):
+    sql = str(stmt.compile(connection, compile_kwargs={"literal_binds": True}))
+    if connection.dialect.name == "postgresql":
+        return "\n".join(r[0] for r in connection.execute(text("EXPLAIN " + sql)))
+    return "\n".join(r[-1] for r in connection.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+def verificar_planos(connection):
+    falhas = []
+    if connection.dialect.name == "postgresql":
+        # Tabelas pequenas levam o planner ao Seq Scan; aqui interessa se o índice É utilizável
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+    tabelas = inspect(connection)
+    for nome, stmt, tabela, indice in CONSULTAS:
+        if not tabelas.has_table(tabela):
+            print(f"⏭️ {nome}: pulada (tabela {tabela} não existe neste banco)")
+            continue
+        texto = plano(connection, stmt)
+        if connection.dialect.name == "postgresql":
+            ok = f"Seq Scan on {tabela}" not in texto
+        else:
+            ok = f"INDEX {indice}" in texto and "USE TEMP B-TREE" not in texto
+        print(f"{'✅' if ok else '❌'} {nome}\n    " + texto.replace("\n", "\n    "))
+        if not ok:
+            falhas.append(nome)
+    return falhas
+
+def verificar_comandos(engine):
+    """Conta os comandos SQL que cada tela dispara (pega N+1 e consultas repetidas)."""
+    from snapshot_processos import SnapshotProcessos
+
+    comandos = []
+    event.listen(engine, "before_cursor_execute", lambda *args: comandos.append(args[2]))
+
+    def contar(nome, acao):
+        comandos.clear()
+        with Session(engine) as session:
+            acao(session)
+        return nome, len(comandos)
+
+    def modalidades_com_fases(session):
+        # Mesmo uso das telas: percorre as fases de cada modalidade devolvida
+        for m in listar_modalidades_com_fases(session):
+            [f.nome for f in m.fases]
+
+    snapshot = SnapshotProcessos()
+    medicoes = [
+        contar("Modalidades com fases (admin e modal Novo Processo)", modalidades_com_fases),
+        contar("Gestão de Processos (1ª carga)", snapshot.obter),
+        contar("Gestão de Processos (rerun sem alteração)", snapshot.obter),
+    ]
+    falhas = []
+    for nome, total in medicoes:
+        ok = total <= LIMITE_COMANDOS[nome]
+        print(f"{'✅' if ok else '❌'} {nome}: {total} comando(s) (limite {LIMITE_COMANDOS[nome]})")
+        if not ok:
+            falhas.append(nome)
+    return falhas
+
+def rodar_sqlite():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        popular(session)
+    with engine.connect() as connection:
+        falhas = verificar_planos(connection)
+    return falhas + verificar_comandos(engine)
+
+async def rodar_postgres():
+    import streamlit as st
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(st.secrets["database"]["url"], echo=False)
+    async with engine.connect() as conn:
+        falhas = await conn.run_sync(verificar_planos)
+        await conn.rollback()  # Desfaz o SET LOCAL; nada é gravado
+    await engine.dispose()
+    return falhas
+
+if __name__ == "__main__":
+    if "--postgres" in sys.argv:
+        falhas = asyncio.run(rodar_postgres())
+    else:
+        falhas = rodar_sqlite()
+    if falhas:
+        print(f"\n❌ {len(falhas)} regressão(ões): {', '.join(falhas)}")
+        sys.exit(1)
+    print("\n🎉 Todas as consultas quentes usam os índices esperados.")